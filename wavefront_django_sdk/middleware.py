@@ -3,11 +3,14 @@ Wavefront Django Middleware.
 
 @author: Hao Song (songhao@vmware.com)
 """
+import collections
 import logging
-import math
 import os
+import re
+import threading
 import time
-from timeit import default_timer
+import weakref
+from functools import lru_cache
 
 from django.conf import settings
 from django.urls import resolve
@@ -26,6 +29,20 @@ from wavefront_pyformance.wavefront_reporter import WavefrontReporter
 
 from wavefront_sdk.common import ApplicationTags, HeartbeaterService
 
+logger = logging.getLogger(__name__)
+
+# Single-pass substitution table for entity names, replacing the chain
+# of str.replace calls that each re-walked and re-allocated the string.
+_ENTITY_TRANSLATE = str.maketrans({'-': '_', '/': '.', '{': '_', '}': '_'})
+
+# Settings the middleware cannot run without, as
+# (setting key, instance attribute, expected type) triples.
+_REQUIRED_CONF = (
+    ('WF_REPORTER', 'reporter', WavefrontReporter),
+    ('APPLICATION_TAGS', 'application_tags', ApplicationTags),
+    ('OPENTRACING_TRACING', 'tracing', DjangoTracing),
+)
+
 
 # pylint: disable=invalid-name, protected-access, too-many-instance-attributes
 class WavefrontMiddleware(MiddlewareMixin):
@@ -37,59 +54,117 @@ class WavefrontMiddleware(MiddlewareMixin):
         :param get_response: Method to get response
         """
         super(WavefrontMiddleware, self).__init__(get_response)
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
         self.MIDDLEWARE_ENABLED = False
         try:
-            self.reporter = self.get_conf('WF_REPORTER')
-            self.application_tags = self.get_conf('APPLICATION_TAGS')
-            self.tracing = self.get_conf('OPENTRACING_TRACING')
             self.is_debug = self.get_conf('WF_DEBUG') or False
-            if not self.reporter or (not isinstance(
-                    self.reporter, WavefrontReporter) and not self.is_debug):
-                raise AttributeError(
-                    "WF_REPORTER not correctly configured!")
-            elif not isinstance(self.application_tags, ApplicationTags):
-                raise AttributeError(
-                    "APPLICATION_TAGS not correctly configured!")
-            elif not isinstance(self.tracing, DjangoTracing):
-                raise AttributeError(
-                    "OPENTRACING_TRACING not correctly configured!")
-            else:
-                self.APPLICATION = self.application_tags.application or \
-                                   NULL_TAG_VAL
-                self.CLUSTER = self.application_tags.cluster or NULL_TAG_VAL
-                self.SERVICE = self.application_tags.service or NULL_TAG_VAL
-                self.SHARD = self.application_tags.shard or NULL_TAG_VAL
-                self.reporter.prefix = REPORTER_PREFIX
-                self.reg = None
-                if self.is_debug:
-                    self.reg = self.get_conf('DEBUG_REGISTRY')
-                self.reg = self.reg or TaggedRegistry()
-                self.reporter.registry = self.reg
-                if not self.get_conf('WF_DISABLE_REPORTING'):
-                    self.reporter.start()
-                    self.heartbeaterService = HeartbeaterService(
-                        wavefront_client=self.reporter.wavefront_client,
-                        application_tags=self.application_tags,
-                        components=DJANGO_COMPONENT,
-                        source=self.reporter.source)
-                self.tracing._trace_all = getattr(settings,
-                                                  'OPENTRACING_TRACE_ALL',
-                                                  True)
-                initialize_global_tracer(self.tracing)
-                self.MIDDLEWARE_ENABLED = True
+            for key, attr, expected_cls in _REQUIRED_CONF:
+                val = self.get_conf(key)
+                # Assign before validating so partially configured
+                # instances still carry the attributes __del__ touches.
+                setattr(self, attr, val)
+                if not isinstance(val, expected_cls) and not (
+                        self.is_debug and val and
+                        expected_cls is WavefrontReporter):
+                    raise AttributeError(f"{key} not correctly configured!")
+            self.APPLICATION = (self.application_tags.application
+                                or NULL_TAG_VAL)
+            self.CLUSTER = self.application_tags.cluster or NULL_TAG_VAL
+            self.SERVICE = self.application_tags.service or NULL_TAG_VAL
+            self.SHARD = self.application_tags.shard or NULL_TAG_VAL
+            self._has_cluster = bool(self.application_tags.cluster)
+            self._has_shard = bool(self.application_tags.shard)
+            # Tag maps that do not depend on the resolved view are
+            # fully determined here, so build them once instead of
+            # on every request.
+            self._overall_per_source_map = self.get_tags_map(
+                cluster=self.CLUSTER,
+                service=self.SERVICE,
+                shard=self.SHARD)
+            self._overall_per_shard_map = self.get_tags_map(
+                cluster=self.CLUSTER,
+                service=self.SERVICE,
+                shard=self.SHARD,
+                source=WAVEFRONT_PROVIDED_SOURCE)
+            self._overall_per_service_map = self.get_tags_map(
+                cluster=self.CLUSTER,
+                service=self.SERVICE,
+                source=WAVEFRONT_PROVIDED_SOURCE)
+            self._overall_per_cluster_map = self.get_tags_map(
+                cluster=self.CLUSTER,
+                source=WAVEFRONT_PROVIDED_SOURCE)
+            self._overall_per_application_map = self.get_tags_map(
+                source=WAVEFRONT_PROVIDED_SOURCE)
+            self.reporter.prefix = REPORTER_PREFIX
+            self.reg = None
+            if self.is_debug:
+                self.reg = self.get_conf('DEBUG_REGISTRY')
+            self.reg = self.reg or TaggedRegistry()
+            self._meter_cache = {}
+            self._tagmap_cache = {}
+            self._inflight = {}
+            self._pending = threading.local()
+            self._pending_bufs = []
+            self._pending_lock = threading.Lock()
+            self._defer_metrics = False
+            excluded_paths = self.get_conf('WF_EXCLUDED_PATHS')
+            self._excluded_paths = \
+                re.compile(excluded_paths) if excluded_paths else None
+            self.reporter.registry = self.reg
+            if hasattr(self.reporter, 'report_now'):
+                # Drain queued counter increments right before each
+                # reporter tick so reported values stay exact. The
+                # wrapper is installed at most once per reporter and
+                # holds the drain callback weakly, so re-instantiating
+                # the middleware (test client, override_settings)
+                # replaces the callback instead of stacking wrappers
+                # that pin old instances alive.
+                reporter = self.reporter
+                reporter._wf_drain_ref = weakref.WeakMethod(
+                    self._drain_pending)
+                if not getattr(reporter, '_wf_report_now_wrapped', False):
+                    reporter_report_now = reporter.report_now
+
+                    def _report_now(*args, **kwargs):
+                        drain = reporter._wf_drain_ref()
+                        if drain is not None:
+                            drain()
+                        return reporter_report_now(*args, **kwargs)
+
+                    reporter.report_now = _report_now
+                    reporter._wf_report_now_wrapped = True
+            if not self.get_conf('WF_DISABLE_REPORTING'):
+                self.reporter.start()
+                # Deferral is only safe once a reporter tick is going
+                # to drain the buffers; otherwise counters must stay
+                # synchronously visible (debug registries, disabled
+                # reporting).
+                self._defer_metrics = hasattr(self.reporter, 'report_now')
+                self.heartbeaterService = HeartbeaterService(
+                    wavefront_client=self.reporter.wavefront_client,
+                    application_tags=self.application_tags,
+                    components=DJANGO_COMPONENT,
+                    source=self.reporter.source)
+            self.tracing._trace_all = getattr(settings,
+                                              'OPENTRACING_TRACE_ALL',
+                                              True)
+            self._trace_all = bool(self.tracing._trace_all)
+            self._traced_attributes = getattr(
+                settings, 'OPENTRACING_TRACED_ATTRIBUTES', ())
+            initialize_global_tracer(self.tracing)
+            self.MIDDLEWARE_ENABLED = True
         except AttributeError as e:
-            self.logger.warning(e)
+            logger.warning(e)
         finally:
             if not self.MIDDLEWARE_ENABLED:
-                self.logger.warning("Wavefront Django Middleware not enabled!")
+                logger.warning("Wavefront Django Middleware not enabled!")
 
     def __del__(self):
         """Destruct Wavefront Django Middleware."""
-        if self.reporter:
+        if getattr(self, '_pending_bufs', None):
+            self._drain_pending()
+        if getattr(self, 'reporter', None):
             self.reporter.stop()
-        if self.heartbeaterService:
+        if getattr(self, 'heartbeaterService', None):
             self.heartbeaterService.close()
 
     # pylint: disable=unused-argument
@@ -104,37 +179,25 @@ class WavefrontMiddleware(MiddlewareMixin):
         """
         if not self.MIDDLEWARE_ENABLED:
             return
-        request.wf_start_timestamp = default_timer()
-        request.wf_cpu_nanos = time.clock()
-
-        entity_name = self.get_entity_name(request)
-        func_name = resolve(request.path_info).func.__name__
-        module_name = resolve(request.path_info).func.__module__
-        self.update_gauge(
-            registry=self.reg,
-            key=self.get_metric_name(entity_name, request) + ".inflight",
-            tags=self.get_tags_map(module_name=module_name,
-                                   func_name=func_name),
-            val=1
-        )
-        self.update_gauge(
-            registry=self.reg,
-            key="total_requests.inflight",
-            tags=self.get_tags_map(
-                cluster=self.CLUSTER,
-                service=self.SERVICE,
-                shard=self.SHARD),
+        if self._excluded_paths and \
+                self._excluded_paths.match(request.path_info):
+            return
+        request.wf_start_timestamp = time.perf_counter_ns()
+        request.wf_cpu_nanos = time.process_time_ns()
+
+        entity_name, func_name, module_name = self._resolve_names(request)
+        request_metric_name = self._metric_names(entity_name,
+                                                 request.method)[0]
+        self.update_gauges(
+            ((request_metric_name + ".inflight",
+              self._canonical_tags(module_name=module_name,
+                                   func_name=func_name)),
+             ("total_requests.inflight", self._overall_per_source_map)),
             val=1
         )
-        if self.tracing:
-            if not self.tracing._trace_all:
-                return
-            if hasattr(settings, 'OPENTRACING_TRACED_ATTRIBUTES'):
-                traced_attributes = getattr(settings,
-                                            'OPENTRACING_TRACED_ATTRIBUTES')
-            else:
-                traced_attributes = []
-            self.tracing._apply_tracing(request, view_func, traced_attributes)
+        if self._trace_all:
+            self.tracing._apply_tracing(request, view_func,
+                                        self._traced_attributes)
 
     # pylint: disable=too-many-locals
     def process_response(self, request, response):
@@ -146,35 +209,27 @@ class WavefrontMiddleware(MiddlewareMixin):
         """
         if not self.MIDDLEWARE_ENABLED:
             return response
-        entity_name = self.get_entity_name(request)
-        func_name = resolve(request.path_info).func.__name__
-        module_name = resolve(request.path_info).func.__module__
+        if not getattr(request, 'wf_start_timestamp', None):
+            # process_view never ran (unresolved view, excluded path or
+            # an earlier middleware short-circuited), so there is no
+            # inflight to decrement and nothing to emit.
+            return response
+        entity_name, func_name, module_name = self._resolve_names(request)
+        request_metric_name, response_metric_key = self._metric_names(
+            entity_name, request.method, response.status_code)
 
         if self.tracing:
             self.tracing._finish_tracing(request, response=response)
 
-        self.update_gauge(
-            registry=self.reg,
-            key=self.get_metric_name(entity_name, request) + ".inflight",
-            tags=self.get_tags_map(
-                module_name=module_name,
-                func_name=func_name),
-            val=-1
-        )
-        self.update_gauge(
-            registry=self.reg,
-            key="total_requests.inflight",
-            tags=self.get_tags_map(
-                cluster=self.CLUSTER,
-                service=self.SERVICE,
-                shard=self.SHARD),
+        self.update_gauges(
+            ((request_metric_name + ".inflight",
+              self._canonical_tags(module_name=module_name,
+                                   func_name=func_name)),
+             ("total_requests.inflight", self._overall_per_source_map)),
             val=-1
         )
 
-        response_metric_key = self.get_metric_name(entity_name, request,
-                                                   response)
-
-        complete_tags_map = self.get_tags_map(
+        complete_tags_map = self._canonical_tags(
             cluster=self.CLUSTER,
             service=self.SERVICE,
             shard=self.SHARD,
@@ -182,7 +237,7 @@ class WavefrontMiddleware(MiddlewareMixin):
             func_name=func_name
         )
 
-        aggregated_per_shard_map = self.get_tags_map(
+        aggregated_per_shard_map = self._canonical_tags(
             cluster=self.CLUSTER,
             service=self.SERVICE,
             shard=self.SHARD,
@@ -190,47 +245,35 @@ class WavefrontMiddleware(MiddlewareMixin):
             func_name=func_name,
             source=WAVEFRONT_PROVIDED_SOURCE)
 
-        overall_aggregated_per_source_map = self.get_tags_map(
-            cluster=self.CLUSTER,
-            service=self.SERVICE,
-            shard=self.SHARD)
+        overall_aggregated_per_source_map = self._overall_per_source_map
 
-        overall_aggregated_per_shard_map = self.get_tags_map(
-            cluster=self.CLUSTER,
-            service=self.SERVICE,
-            shard=self.SHARD,
-            source=WAVEFRONT_PROVIDED_SOURCE)
+        overall_aggregated_per_shard_map = self._overall_per_shard_map
 
-        aggregated_per_service_map = self.get_tags_map(
+        aggregated_per_service_map = self._canonical_tags(
             cluster=self.CLUSTER,
             service=self.SERVICE,
             module_name=module_name,
             func_name=func_name,
             source=WAVEFRONT_PROVIDED_SOURCE)
 
-        overall_aggregated_per_service_map = self.get_tags_map(
-            cluster=self.CLUSTER,
-            service=self.SERVICE,
-            source=WAVEFRONT_PROVIDED_SOURCE)
+        overall_aggregated_per_service_map = self._overall_per_service_map
 
-        aggregated_per_cluster_map = self.get_tags_map(
+        aggregated_per_cluster_map = self._canonical_tags(
             cluster=self.CLUSTER,
             module_name=module_name,
             func_name=func_name,
             source=WAVEFRONT_PROVIDED_SOURCE)
 
-        overall_aggregated_per_cluster_map = self.get_tags_map(
-            cluster=self.CLUSTER,
-            source=WAVEFRONT_PROVIDED_SOURCE)
+        overall_aggregated_per_cluster_map = self._overall_per_cluster_map
 
-        aggregated_per_application_map = self.get_tags_map(
+        aggregated_per_application_map = self._canonical_tags(
             module_name=module_name,
             func_name=func_name,
             source=WAVEFRONT_PROVIDED_SOURCE
         )
 
-        overall_aggregated_per_application_map = self.get_tags_map(
-            source=WAVEFRONT_PROVIDED_SOURCE)
+        overall_aggregated_per_application_map = \
+            self._overall_per_application_map
 
         # django.server.response.style._id_.make.GET.200.cumulative.count
         # django.server.response.style._id_.make.GET.200.aggregated_per_shard.count
@@ -238,22 +281,25 @@ class WavefrontMiddleware(MiddlewareMixin):
         # django.server.response.style._id_.make.GET.200.aggregated_per_cluster.count
         # django.server.response.style._id_.make.GET.200.aggregated_per_application.count
         # django.server.response.style._id_.make.GET.errors
-        self.reg.counter(response_metric_key + ".cumulative",
-                         tags=complete_tags_map).inc()
-        if self.application_tags.shard:
-            delta_counter(
-                self.reg, response_metric_key + ".aggregated_per_shard",
-                tags=aggregated_per_shard_map).inc()
-        delta_counter(
-            self.reg, response_metric_key + ".aggregated_per_service",
-            tags=aggregated_per_service_map).inc()
-        if self.application_tags.cluster:
-            delta_counter(
-                self.reg, response_metric_key + ".aggregated_per_cluster",
-                tags=aggregated_per_cluster_map).inc()
-        delta_counter(
-            self.reg, response_metric_key + ".aggregated_per_application",
-            tags=aggregated_per_application_map).inc()
+        self._defer_inc('counter', response_metric_key + ".cumulative",
+                        complete_tags_map)
+        if self._has_shard:
+            self._defer_inc(
+                'delta_counter',
+                response_metric_key + ".aggregated_per_shard",
+                aggregated_per_shard_map)
+        self._defer_inc(
+            'delta_counter', response_metric_key + ".aggregated_per_service",
+            aggregated_per_service_map)
+        if self._has_cluster:
+            self._defer_inc(
+                'delta_counter',
+                response_metric_key + ".aggregated_per_cluster",
+                aggregated_per_cluster_map)
+        self._defer_inc(
+            'delta_counter',
+            response_metric_key + ".aggregated_per_application",
+            aggregated_per_application_map)
 
         # django.server.response.errors.aggregated_per_source.count
         # django.server.response.errors.aggregated_per_shard.count
@@ -261,59 +307,184 @@ class WavefrontMiddleware(MiddlewareMixin):
         # django.server.response.errors.aggregated_per_cluster.count
         # django.server.response.errors.aggregated_per_application.count
         if self.is_error_status_code(response):
-            self.reg.counter(
-                self.get_metric_name_without_status(entity_name, request),
-                tags=complete_tags_map).inc()
-            self.reg.counter("response.errors", tags=complete_tags_map).inc()
-            self.reg.counter("response.errors.aggregated_per_source",
-                             tags=overall_aggregated_per_source_map).inc()
-            if self.application_tags.shard:
-                delta_counter(self.reg, "response.errors.aggregated_per_shard",
-                              tags=overall_aggregated_per_shard_map).inc()
-            delta_counter(self.reg, "response.errors.aggregated_per_service",
-                          tags=overall_aggregated_per_service_map).inc()
-            if self.application_tags.cluster:
-                delta_counter(self.reg,
-                              "response.errors.aggregated_per_cluster",
-                              tags=overall_aggregated_per_cluster_map).inc()
-            delta_counter(self.reg,
-                          "response.errors.aggregated_per_application",
-                          tags=overall_aggregated_per_application_map).inc()
+            self._defer_inc('counter', request_metric_name,
+                            complete_tags_map)
+            self._defer_inc('counter', "response.errors",
+                            complete_tags_map)
+            self._defer_inc('counter',
+                            "response.errors.aggregated_per_source",
+                            overall_aggregated_per_source_map)
+            if self._has_shard:
+                self._defer_inc('delta_counter',
+                                "response.errors.aggregated_per_shard",
+                                overall_aggregated_per_shard_map)
+            self._defer_inc('delta_counter',
+                            "response.errors.aggregated_per_service",
+                            overall_aggregated_per_service_map)
+            if self._has_cluster:
+                self._defer_inc('delta_counter',
+                                "response.errors.aggregated_per_cluster",
+                                overall_aggregated_per_cluster_map)
+            self._defer_inc('delta_counter',
+                            "response.errors.aggregated_per_application",
+                            overall_aggregated_per_application_map)
 
         # django.server.response.completed.aggregated_per_source.count
         # django.server.response.completed.aggregated_per_shard.count
         # django.server.response.completed.aggregated_per_service.count
         # django.server.response.completed.aggregated_per_cluster.count
         # django.server.response.completed.aggregated_per_application.count
-        self.reg.counter("response.completed.aggregated_per_source",
-                         tags=overall_aggregated_per_source_map).inc()
-        if self.SHARD is not NULL_TAG_VAL:
-            delta_counter(
-                self.reg, "response.completed.aggregated_per_shard",
-                tags=overall_aggregated_per_shard_map).inc()
-            self.reg.counter("response.completed.aggregated_per_service",
-                             tags=overall_aggregated_per_service_map).inc()
-        if self.CLUSTER is not NULL_TAG_VAL:
-            delta_counter(
-                self.reg, "response.completed.aggregated_per_cluster",
-                tags=overall_aggregated_per_cluster_map).inc()
-            self.reg.counter("response.completed.aggregated_per_application",
-                             tags=overall_aggregated_per_application_map).inc()
+        self._defer_inc('counter',
+                        "response.completed.aggregated_per_source",
+                        overall_aggregated_per_source_map)
+        if self._has_shard:
+            self._defer_inc('delta_counter',
+                            "response.completed.aggregated_per_shard",
+                            overall_aggregated_per_shard_map)
+            self._defer_inc('counter',
+                            "response.completed.aggregated_per_service",
+                            overall_aggregated_per_service_map)
+        if self._has_cluster:
+            self._defer_inc('delta_counter',
+                            "response.completed.aggregated_per_cluster",
+                            overall_aggregated_per_cluster_map)
+            self._defer_inc('counter',
+                            "response.completed.aggregated_per_application",
+                            overall_aggregated_per_application_map)
 
         # django.server.response.style._id_.make.summary.GET.200.latency.m
         # django.server.response.style._id_.make.summary.GET.200.cpu_ns.m
         # django.server.response.style._id_.make.summary.GET.200.total_time.count
-        if hasattr(request, 'wf_start_timestamp'):
-            timestamp_duration = default_timer() - request.wf_start_timestamp
-            cpu_nanos_duration = time.clock() - request.wf_cpu_nanos
-            wavefront_histogram(self.reg, response_metric_key + ".latency",
-                                tags=complete_tags_map).add(timestamp_duration)
-            wavefront_histogram(self.reg, response_metric_key + ".cpu_ns",
-                                tags=complete_tags_map).add(cpu_nanos_duration)
-            self.reg.counter(response_metric_key + ".total_time",
-                             tags=complete_tags_map).inc(timestamp_duration)
+        timestamp_duration = (time.perf_counter_ns() -
+                              request.wf_start_timestamp) * 1e-9
+        cpu_nanos_duration = time.process_time_ns() - request.wf_cpu_nanos
+        self._meter('histogram', response_metric_key + ".latency",
+                    complete_tags_map).add(timestamp_duration)
+        self._meter('histogram', response_metric_key + ".cpu_ns",
+                    complete_tags_map).add(cpu_nanos_duration)
+        self._defer_inc('counter', response_metric_key + ".total_time",
+                        complete_tags_map, timestamp_duration)
         return response
 
+    # pylint: disable=too-many-arguments
+    def _canonical_tags(self, cluster=None, service=None, shard=None,
+                        module_name=None, func_name=None, source=None):
+        """Get an interned tags map shared across requests.
+
+        Builds the same dict as get_tags_map but caches one instance per
+        distinct tag combination, so requests hitting the same view
+        reuse a single dict instead of allocating and re-hashing a fresh
+        one every time. Module and func names come from the URL conf, so
+        the cache stays bounded.
+
+        :return: tags of span, shared for identical combinations.
+        """
+        cache_key = (cluster, service, shard, module_name, func_name, source)
+        tags_map = self._tagmap_cache.get(cache_key)
+        if tags_map is None:
+            tags_map = self.get_tags_map(
+                cluster=cluster, service=service, shard=shard,
+                module_name=module_name, func_name=func_name, source=source)
+            self._tagmap_cache[cache_key] = tags_map
+        return tags_map
+
+    # Cap on queued increments per thread, in case reporting is
+    # disabled and no reporter tick ever drains the buffers.
+    _PENDING_FLUSH_LIMIT = 512
+
+    def _defer_inc(self, kind, key, tags, delta=1):
+        """Queue a counter increment instead of emitting it inline.
+
+        Counter deltas are additive, so N queued increments for the same
+        meter coalesce exactly into a single inc(N) when the buffers are
+        drained - once per reporter tick rather than once per emission -
+        which keeps registry lock traffic off the request path.
+
+        :param kind: Kind of counter - 'counter' or 'delta_counter'.
+        :param key: Key of the counter.
+        :param tags: Tags of the counter.
+        :param delta: Amount to add, defaults to 1.
+        """
+        if not self._defer_metrics:
+            # No reporter tick will ever drain the buffers (reporting
+            # disabled or a debug registry), so emit inline and keep
+            # counters inspectable right after the request.
+            self._meter(kind, key, tags).inc(delta)
+            return
+        try:
+            buf = self._pending.buf
+        except AttributeError:
+            buf = self._pending.buf = collections.deque()
+            with self._pending_lock:
+                self._pending_bufs.append(
+                    (threading.current_thread(), buf))
+        buf.append((self._meter(kind, key, tags), delta))
+        if len(buf) >= self._PENDING_FLUSH_LIMIT:
+            self._drain_pending()
+
+    def _drain_pending(self):
+        """Coalesce and apply all queued counter increments.
+
+        Buffers owned by threads that have exited are pruned after
+        their leftovers are applied, so thread-per-request servers do
+        not accumulate one dead deque per worker thread ever started.
+        """
+        with self._pending_lock:
+            entries = list(self._pending_bufs)
+        dead = []
+        for entry in entries:
+            thread, buf = entry
+            # Check liveness before draining: a thread that is already
+            # dead cannot append again, so pruning it afterwards cannot
+            # lose increments.
+            if not thread.is_alive():
+                dead.append(entry)
+            totals = {}
+            while True:
+                try:
+                    meter, delta = buf.popleft()
+                except IndexError:
+                    break
+                bucket = totals.get(id(meter))
+                if bucket is None:
+                    totals[id(meter)] = [meter, delta]
+                else:
+                    bucket[1] += delta
+            for meter, total in totals.values():
+                meter.inc(total)
+        if dead:
+            with self._pending_lock:
+                for entry in dead:
+                    if entry in self._pending_bufs:
+                        self._pending_bufs.remove(entry)
+
+    def _meter(self, kind, key, tags):
+        """Get a meter handle from the registry, caching the result.
+
+        Registry lookups re-hash the key and tags on every call; view
+        names and status codes are low-cardinality, so cache the handles
+        returned for each (kind, key, tags) triple instead.
+
+        :param kind: Kind of meter - 'counter', 'delta_counter',
+            'histogram' or 'gauge'.
+        :param key: Key of the meter.
+        :param tags: Tags of the meter.
+        :return: Meter registered for the given kind, key and tags.
+        """
+        cache_key = (kind, key, tuple(sorted(tags.items())))
+        meter = self._meter_cache.get(cache_key)
+        if meter is None:
+            if kind == 'counter':
+                meter = self.reg.counter(key, tags=tags)
+            elif kind == 'delta_counter':
+                meter = delta_counter(self.reg, key, tags=tags)
+            elif kind == 'histogram':
+                meter = wavefront_histogram(self.reg, key, tags=tags)
+            else:
+                meter = self.reg.gauge(key=key, tags=tags)
+            self._meter_cache[cache_key] = meter
+        return meter
+
     # pylint: disable=too-many-arguments
     def get_tags_map(self, cluster=None, service=None, shard=None,
                      module_name=None, func_name=None, source=None):
@@ -342,6 +513,67 @@ class WavefrontMiddleware(MiddlewareMixin):
             tags_map['source'] = source
         return tags_map
 
+    @staticmethod
+    def _resolve_names(request):
+        """Get view naming details for a request.
+
+        Prefers request.resolver_match, which Django already populated
+        during URL dispatch, so no extra URL conf walk is needed. Only
+        requests seen before dispatch fall back to a memoized resolve().
+
+        :param request: Http request.
+        :return: Tuple of (entity name, func name, module name).
+        """
+        match = request.resolver_match
+        if match is not None:
+            return WavefrontMiddleware._names_from_match(match)
+        return WavefrontMiddleware._resolve_path_names(request.path_info)
+
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _resolve_path_names(path_info):
+        """Resolve a request path into view naming details.
+
+        The result is a deterministic function of the URL path, so it is
+        memoized to avoid walking the URL conf and rewriting the same
+        strings on every request.
+
+        :param path_info: Path of the Http request.
+        :return: Tuple of (entity name, func name, module name).
+        """
+        return WavefrontMiddleware._names_from_match(resolve(path_info))
+
+    @staticmethod
+    def _names_from_match(match):
+        """Get (entity name, func name, module name) from a url match.
+
+        :param match: ResolverMatch of the request.
+        :return: Tuple of (entity name, func name, module name).
+        """
+        entity_name = match.url_name or match.view_name
+        return (entity_name.translate(_ENTITY_TRANSLATE).strip('.'),
+                match.func.__name__,
+                match.func.__module__)
+
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _metric_names(entity_name, method, status_code=None):
+        """Get request and response metric names for a resolved view.
+
+        Memoized since entity names, methods and status codes all come
+        from small, bounded domains.
+
+        :param entity_name: Entity Name.
+        :param method: HTTP method of the request.
+        :param status_code: Status code of the response, if any.
+        :return: Tuple of (request metric name, response metric name).
+        """
+        request_name = f"{REQUEST_PREFIX}.{entity_name}.{method}"
+        if status_code is None:
+            return request_name, None
+        return (request_name,
+                f"{RESPONSE_PREFIX}.{entity_name}.{method}.{status_code}")
+
     @staticmethod
     def get_entity_name(request):
         """Get entity name from the request.
@@ -354,11 +586,10 @@ class WavefrontMiddleware(MiddlewareMixin):
             entity_name = resolver_match.url_name
             if not entity_name:
                 entity_name = resolver_match.view_name
-            entity_name = entity_name.replace('-', '_').replace('/', '.'). \
-                replace('{', '_').replace('}', '_')
+            entity_name = entity_name.translate(_ENTITY_TRANSLATE)
         else:
             entity_name = 'UNKNOWN'
-        return entity_name.lstrip('.').rstrip('.')
+        return entity_name.strip('.')
 
     @staticmethod
     def get_metric_name(entity_name, request, response=None):
@@ -369,13 +600,10 @@ class WavefrontMiddleware(MiddlewareMixin):
         :param response: Response obj.
         :return: Metric name.
         """
-        metric_name = [entity_name, request.method]
         if response:
-            metric_name.insert(0, RESPONSE_PREFIX)
-            metric_name.append(str(response.status_code))
-        else:
-            metric_name.insert(0, REQUEST_PREFIX)
-        return '.'.join(metric_name)
+            return (f"{RESPONSE_PREFIX}.{entity_name}."
+                    f"{request.method}.{response.status_code}")
+        return f"{REQUEST_PREFIX}.{entity_name}.{request.method}"
 
     @staticmethod
     def get_metric_name_without_status(entity_name, request):
@@ -385,9 +613,7 @@ class WavefrontMiddleware(MiddlewareMixin):
         :param request: Http request.
         :return: Metric name
         """
-        metric_name = [entity_name, request.method]
-        metric_name.insert(0, REQUEST_PREFIX)
-        return '.'.join(metric_name)
+        return f"{REQUEST_PREFIX}.{entity_name}.{request.method}"
 
     @staticmethod
     def is_error_status_code(response):
@@ -398,20 +624,42 @@ class WavefrontMiddleware(MiddlewareMixin):
         """
         return 400 <= response.status_code <= 599
 
-    @staticmethod
-    def update_gauge(registry, key, tags, val):
+    def update_gauges(self, updates, val):
+        """Apply the same delta to several gauges in one pass.
+
+        Used for the paired per-view and total inflight gauges, whose
+        handles both come from the meter cache once warmed.
+
+        :param updates: Iterable of (key, tags) pairs.
+        :param val: Value to add to each gauge.
+        """
+        for key, tags in updates:
+            self.update_gauge(key, tags, val)
+
+    def update_gauge(self, key, tags, val):
         """Update gauge value.
 
-        :param registry: TaggedRegistry from pyformance.
+        The running total is kept per gauge and guarded by a lock, so
+        concurrent requests under threaded workers cannot lose an
+        inflight increment the way an unguarded get_value/set_value
+        round trip could.
+
         :param key: Key of the gauge.
         :param tags: Tags of the gauge.
-        :param val: Value of the gauge.
+        :param val: Value to add to the gauge.
         """
-        gauge = registry.gauge(key=key, tags=tags)
-        cur_val = gauge.get_value()
-        if math.isnan(cur_val):
-            cur_val = 0
-        gauge.set_value(cur_val + val)
+        cache_key = (key, tuple(sorted(tags.items())))
+        entry = self._inflight.get(cache_key)
+        if entry is None:
+            # setdefault is atomic, so threads first-touching the same
+            # gauge all end up sharing a single entry.
+            entry = self._inflight.setdefault(
+                cache_key, [0, threading.Lock()])
+        with entry[1]:
+            entry[0] += val
+            # Publish while still holding the lock so interleaved
+            # updates cannot write stale totals out of order.
+            self._meter('gauge', key, tags).set_value(entry[0])
 
     @staticmethod
     def get_conf(key):
@@ -421,7 +669,7 @@ class WavefrontMiddleware(MiddlewareMixin):
         :return: Value of the configuration.
         """
         if hasattr(settings, key):
-            return settings.__getattr__(key)
+            return getattr(settings, key)
         if key in os.environ:
             return os.environ[key]
         return None
@@ -19,17 +19,24 @@ class DjangoTracing(tracing.DjangoTracing):
         if scope is None:
             return
         if response is not None:
-            func_name = resolve(request.path_info).func.__name__
-            module_name = resolve(request.path_info).func.__module__
-            scope.span.set_tag("http.status_code", str(response.status_code))
+            match = request.resolver_match or resolve(request.path_info)
+            span = scope.span
+            tags = {
+                "http.status_code": str(response.status_code),
+                "span.kind": "server",
+                "django.resource.module": match.func.__module__,
+                "django.resource.func": match.func.__name__,
+                "component": DJANGO_COMPONENT,
+                "http.method": request.method,
+                "http.url": request.build_absolute_uri(),
+            }
             if 400 <= response.status_code <= 599:
-                scope.span.set_tag("error", "true")
-                error_log = {"error_code": response.status_code}
-                scope.span.log_kv(error_log)
-            scope.span.set_tag("span.kind", "server")
-            scope.span.set_tag("django.resource.module", module_name)
-            scope.span.set_tag("django.resource.func", func_name)
-            scope.span.set_tag("component", DJANGO_COMPONENT)
-            scope.span.set_tag("http.method", request.method)
-            scope.span.set_tag("http.url", request.build_absolute_uri())
+                tags["error"] = "true"
+                span.log_kv({"error_code": response.status_code})
+            set_tags = getattr(span, 'set_tags', None)
+            if set_tags is not None:
+                set_tags(tags)
+            else:
+                for key, val in tags.items():
+                    span.set_tag(key, val)
         scope.close()